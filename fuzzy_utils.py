@@ -1,4 +1,2 @@
-from fuzzywuzzy import fuzz
-
-def fuzzy_compare(a, b):
-    return fuzz.ratio(a.lower(), b.lower())
+# Kept for old imports; the implementation lives in utils/fuzzy_utils.py
+from utils.fuzzy_utils import fuzzy_compare, fuzzy_best_match
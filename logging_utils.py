@@ -1,8 +1,2 @@
-def log(msg):
-    print(f"[INFO] {msg}")
-
-def warn(msg):
-    print(f"[WARN] {msg}")
-
-def error(msg):
-    print(f"[ERROR] {msg}")
+# Kept for old imports; the implementation lives in utils/logging_utils.py
+from utils.logging_utils import log, warn, error
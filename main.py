@@ -3,14 +3,26 @@ Main entry point for the automated playlist generator.
 Orchestrates the entire workflow from reading events to creating playlists.
 """
 
+import logging
 import os
 import sys
 from google_sheets import fetch_events_from_sheet
 from playlist_builder import process_events
 
 
+def configure_logging():
+    """Route library logging to stdout in the same [LEVEL] style as our prints."""
+    logging.addLevelName(logging.WARNING, "WARN")
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        format="[%(levelname)s] %(message)s",
+        stream=sys.stdout
+    )
+
+
 def main():
     """Main execution function."""
+    configure_logging()
     print("[INFO] Starting automated playlist generator...")
     
     # Validate required environment variables
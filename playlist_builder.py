@@ -3,10 +3,49 @@ Playlist builder module.
 Orchestrates the process of fetching setlists and creating Spotify playlists.
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from setlistfm_api import get_setlist_for_event
 from spotify_client import SpotifyClient
 
 
+# Setlist.fm lookups run ahead in the background so their (rate-limited)
+# network time overlaps Spotify matching of earlier events
+SETLIST_PREFETCH_WORKERS = 2
+
+# Spotify /search calls for one setlist are independent; a small pool keeps
+# several in flight without tripping the API's rate limit
+SPOTIFY_SEARCH_WORKERS = 4
+
+
+def _prefetch_setlists(events):
+    """Yield setlist data for each event, in order, fetched ahead of use."""
+    with ThreadPoolExecutor(max_workers=SETLIST_PREFETCH_WORKERS) as executor:
+        yield from executor.map(get_setlist_for_event, events)
+
+
+def _song_key(song):
+    """Case- and spacing-insensitive (name, artist) key for a song dict."""
+    return (" ".join(song["name"].split()).casefold(),
+            " ".join(song["artist"].split()).casefold())
+
+
+def _search_tracks(spotify, songs):
+    """Return Spotify URIs (or None) for each song dict, in input order."""
+    # Encores and shared covers repeat songs; concurrent searches for the
+    # same song would all miss the client's cache, so search each once
+    unique = {}
+    for song in songs:
+        unique.setdefault(_song_key(song), song)
+    
+    with ThreadPoolExecutor(max_workers=SPOTIFY_SEARCH_WORKERS) as executor:
+        uris = dict(zip(unique, executor.map(
+            lambda song: spotify.search_track(song["name"], song["artist"]),
+            unique.values()
+        )))
+    
+    return [uris[_song_key(song)] for song in songs]
+
+
 def process_events(events, dry_run=False):
     """
     Process all events and create/update Spotify playlists.
@@ -31,156 +70,155 @@ def process_events(events, dry_run=False):
         "failed_songs": []
     }
     
-    for idx, event in enumerate(events, 1):
-        print(f"\n[INFO] ========== Processing event {idx}/{len(events)} ==========")
-        print(f"[INFO] Artist: {event['artist']}")
-        print(f"[INFO] Date: {event['date']}")
-        print(f"[INFO] Venue: {event.get('venue', 'N/A')}")
-        print(f"[INFO] City: {event.get('city', 'N/A')}")
-        print(f"[INFO] Festival: {event.get('is_festival', False)}")
-        
-        # Get setlist from Setlist.fm
-        setlist_data = get_setlist_for_event(event)
-        
-        if not setlist_data:
-            reason = f"{event['artist']} on {event['date']}: No setlist data found"
-            print(f"[WARN] {reason}")
-            stats["events_skipped"] += 1
-            stats["skipped_reasons"].append(reason)
-            continue
-        
-        # Generate playlist name early to check for duplicates
-        if setlist_data.get("is_festival"):
-            festival_name = setlist_data.get("festival_name", event["artist"])
-            playlist_name = f"{festival_name} - {event['date']}"
-        else:
-            playlist_name = f"{event['artist']} - {event['date']}"
-        
-        playlist_name_trimmed = playlist_name[:100] if len(playlist_name) > 100 else playlist_name
-        
-        # Check if playlist already exists BEFORE matching songs
-        print(f"[INFO] Checking if playlist already exists: {playlist_name_trimmed}")
-        existing_id = spotify.find_playlist_by_name(playlist_name_trimmed)
-        
-        if existing_id:
-            print(f"[INFO] Playlist '{playlist_name_trimmed}' already exists (ID: {existing_id})")
-            print(f"[INFO] Skipping song matching and re-using existing playlist")
-            stats["playlists_updated"] += 1
-            continue
-        
-        print(f"[INFO] Playlist does not exist, will create new one after matching songs")
-        
-        # Extract songs from setlist
-        all_songs = []
-        artists_in_order = []
-        
-        # Add openers first (if any)
-        for opener in setlist_data.get("openers", []):
-            opener_name = opener["name"]
-            opener_songs = opener["songs"]
-            
-            if opener_songs:
-                print(f"[INFO] Adding {len(opener_songs)} songs from opener: {opener_name}")
-                artists_in_order.append(opener_name)
-                all_songs.extend([{"name": song, "artist": opener_name} for song in opener_songs])
-        
-        # Add headliner
-        headliner = setlist_data.get("headliner", {})
-        headliner_name = headliner.get("name", "")
-        headliner_songs = headliner.get("songs", [])
-        
-        if headliner_songs:
-            print(f"[INFO] Adding {len(headliner_songs)} songs from headliner: {headliner_name}")
-            artists_in_order.append(headliner_name)
-            all_songs.extend([{"name": song, "artist": headliner_name} for song in headliner_songs])
-        
-        if not all_songs:
-            reason = f"{event['artist']} on {event['date']}: No songs found in setlist"
-            print(f"[WARN] {reason}")
-            stats["events_skipped"] += 1
-            stats["skipped_reasons"].append(reason)
-            continue
-        
-        print(f"[INFO] Total songs to match: {len(all_songs)}")
-        
-        # Match songs to Spotify tracks
-        track_uris = []
-        matched_count = 0
-        failed_count = 0
-        
-        for song_info in all_songs:
-            song_name = song_info["name"]
-            artist_name = song_info["artist"]
-            
-            track_uri = spotify.search_track(song_name, artist_name)
-            
-            if track_uri:
-                track_uris.append(track_uri)
-                matched_count += 1
+    try:
+        for idx, (event, setlist_data) in enumerate(zip(events, _prefetch_setlists(events)), 1):
+            print(f"\n[INFO] ========== Processing event {idx}/{len(events)} ==========")
+            print(f"[INFO] Artist: {event['artist']}")
+            print(f"[INFO] Date: {event['date']}")
+            print(f"[INFO] Venue: {event.get('venue', 'N/A')}")
+            print(f"[INFO] City: {event.get('city', 'N/A')}")
+            print(f"[INFO] Festival: {event.get('is_festival', False)}")
+        
+            if not setlist_data:
+                reason = f"{event['artist']} on {event['date']}: No setlist data found"
+                print(f"[WARN] {reason}")
+                stats["events_skipped"] += 1
+                stats["skipped_reasons"].append(reason)
+                continue
+        
+            # Generate playlist name early to check for duplicates
+            if setlist_data.get("is_festival"):
+                festival_name = setlist_data.get("festival_name", event["artist"])
+                playlist_name = f"{festival_name} - {event['date']}"
             else:
-                failed_count += 1
-                failed_song = f"{song_name} by {artist_name} ({event['artist']} - {event['date']})"
-                stats["failed_songs"].append(failed_song)
-                print(f"[WARN] Failed to match: {song_name} by {artist_name}")
-        
-        stats["total_songs_matched"] += matched_count
-        stats["total_failed_matches"] += failed_count
-        
-        print(f"[INFO] Matched {matched_count}/{len(all_songs)} songs ({failed_count} failed)")
-        
-        if not track_uris:
-            reason = f"{event['artist']} on {event['date']}: No tracks matched on Spotify"
-            print(f"[WARN] {reason}")
-            stats["events_skipped"] += 1
-            stats["skipped_reasons"].append(reason)
-            continue
-        
-        # Generate playlist name and description
-        if setlist_data.get("is_festival"):
-            # Festival mode
-            festival_name = setlist_data.get("festival_name", event["artist"])
-            playlist_name = f"{festival_name} - {event['date']}"
-            description = f"{event['date']} - {event.get('city', '')}"
+                playlist_name = f"{event['artist']} - {event['date']}"
+        
+            playlist_name_trimmed = playlist_name[:100] if len(playlist_name) > 100 else playlist_name
+        
+            # Check if playlist already exists BEFORE matching songs
+            print(f"[INFO] Checking if playlist already exists: {playlist_name_trimmed}")
+            existing_id = spotify.find_playlist_by_name(playlist_name_trimmed)
+        
+            if existing_id:
+                print(f"[INFO] Playlist '{playlist_name_trimmed}' already exists (ID: {existing_id})")
+                print(f"[INFO] Skipping song matching and re-using existing playlist")
+                stats["playlists_updated"] += 1
+                continue
+        
+            print(f"[INFO] Playlist does not exist, will create new one after matching songs")
+        
+            # Extract songs from setlist
+            all_songs = []
+            artists_in_order = []
+        
+            # Add openers first (if any)
+            for opener in setlist_data.get("openers", []):
+                opener_name = opener["name"]
+                opener_songs = opener["songs"]
             
-            stats["festivals_processed"] += 1
-        else:
-            # Normal concert mode
-            playlist_name = f"{event['artist']} - {event['date']}"
-            description = f"{event['date']} - {event.get('venue', '')} - {event.get('city', '')}"
+                if opener_songs:
+                    print(f"[INFO] Adding {len(opener_songs)} songs from opener: {opener_name}")
+                    artists_in_order.append(opener_name)
+                    all_songs.extend([{"name": song, "artist": opener_name} for song in opener_songs])
+        
+            # Add headliner
+            headliner = setlist_data.get("headliner", {})
+            headliner_name = headliner.get("name", "")
+            headliner_songs = headliner.get("songs", [])
+        
+            if headliner_songs:
+                print(f"[INFO] Adding {len(headliner_songs)} songs from headliner: {headliner_name}")
+                artists_in_order.append(headliner_name)
+                all_songs.extend([{"name": song, "artist": headliner_name} for song in headliner_songs])
         
-        print(f"[DEBUG] Generated playlist name: '{playlist_name}' (length: {len(playlist_name)})")
+            if not all_songs:
+                reason = f"{event['artist']} on {event['date']}: No songs found in setlist"
+                print(f"[WARN] {reason}")
+                stats["events_skipped"] += 1
+                stats["skipped_reasons"].append(reason)
+                continue
+        
+            print(f"[INFO] Total songs to match: {len(all_songs)}")
+        
+            # Match songs to Spotify tracks
+            track_uris = []
+            matched_count = 0
+            failed_count = 0
+        
+            for song_info, track_uri in zip(all_songs, _search_tracks(spotify, all_songs)):
+                song_name = song_info["name"]
+                artist_name = song_info["artist"]
+            
+                if track_uri:
+                    track_uris.append(track_uri)
+                    matched_count += 1
+                else:
+                    failed_count += 1
+                    failed_song = f"{song_name} by {artist_name} ({event['artist']} - {event['date']})"
+                    stats["failed_songs"].append(failed_song)
+                    print(f"[WARN] Failed to match: {song_name} by {artist_name}")
         
-        # Create or update playlist
-        playlist_name_trimmed = playlist_name[:100] if len(playlist_name) > 100 else playlist_name
+            stats["total_songs_matched"] += matched_count
+            stats["total_failed_matches"] += failed_count
         
-        if playlist_name_trimmed != playlist_name:
-            print(f"[DEBUG] Trimmed playlist name to: '{playlist_name_trimmed}'")
+            print(f"[INFO] Matched {matched_count}/{len(all_songs)} songs ({failed_count} failed)")
         
-        existing_id = spotify.find_playlist_by_name(playlist_name_trimmed)
+            if not track_uris:
+                reason = f"{event['artist']} on {event['date']}: No tracks matched on Spotify"
+                print(f"[WARN] {reason}")
+                stats["events_skipped"] += 1
+                stats["skipped_reasons"].append(reason)
+                continue
         
-        if existing_id:
-            print(f"[INFO] Playlist '{playlist_name_trimmed}' already exists (ID: {existing_id})")
+            # Generate playlist name and description
+            if setlist_data.get("is_festival"):
+                # Festival mode
+                festival_name = setlist_data.get("festival_name", event["artist"])
+                playlist_name = f"{festival_name} - {event['date']}"
+                description = f"{event['date']} - {event.get('city', '')}"
             
-            if dry_run:
-                print(f"[DRY RUN] Would update existing playlist with {len(track_uris)} tracks")
+                stats["festivals_processed"] += 1
             else:
-                print(f"[INFO] Updating existing playlist with {len(track_uris)} tracks")
-                spotify.update_playlist(existing_id, track_uris)
+                # Normal concert mode
+                playlist_name = f"{event['artist']} - {event['date']}"
+                description = f"{event['date']} - {event.get('venue', '')} - {event.get('city', '')}"
+        
+            print(f"[DEBUG] Generated playlist name: '{playlist_name}' (length: {len(playlist_name)})")
+        
+            # Create or update playlist
+            playlist_name_trimmed = playlist_name[:100] if len(playlist_name) > 100 else playlist_name
+        
+            if playlist_name_trimmed != playlist_name:
+                print(f"[DEBUG] Trimmed playlist name to: '{playlist_name_trimmed}'")
+        
+            existing_id = spotify.find_playlist_by_name(playlist_name_trimmed)
+        
+            if existing_id:
+                print(f"[INFO] Playlist '{playlist_name_trimmed}' already exists (ID: {existing_id})")
             
-            stats["playlists_updated"] += 1
-        else:
-            print(f"[INFO] Creating new playlist: {playlist_name_trimmed}")
+                if dry_run:
+                    print(f"[DRY RUN] Would update existing playlist with {len(track_uris)} tracks")
+                else:
+                    print(f"[INFO] Updating existing playlist with {len(track_uris)} tracks")
+                    spotify.update_playlist(existing_id, track_uris)
             
-            if dry_run:
-                print(f"[DRY RUN] Would create playlist with {len(track_uris)} tracks")
-                stats["playlists_created"] += 1
+                stats["playlists_updated"] += 1
             else:
-                playlist_id = spotify.create_playlist(playlist_name_trimmed, description, track_uris)
-                
-                if playlist_id:
+                print(f"[INFO] Creating new playlist: {playlist_name_trimmed}")
+            
+                if dry_run:
+                    print(f"[DRY RUN] Would create playlist with {len(track_uris)} tracks")
                     stats["playlists_created"] += 1
                 else:
-                    print(f"[ERROR] Failed to create playlist for {event['artist']}")
+                    playlist_id = spotify.create_playlist(playlist_name_trimmed, description, track_uris)
+                
+                    if playlist_id:
+                        stats["playlists_created"] += 1
+                    else:
+                        print(f"[ERROR] Failed to create playlist for {event['artist']}")
+    finally:
+        # Keep the matches made so far even if an event blew up
+        spotify.save_cache()
     
     # Print summary report
     print("\n" + "="*60)
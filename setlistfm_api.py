@@ -3,39 +3,266 @@ Setlist.fm API integration module.
 Handles querying setlists for concerts and festivals.
 """
 
+import logging
 import os
+import re
+import orjson
 import requests
+import shelve
+import threading
 import time
-from datetime import datetime
-from rapidfuzz import fuzz
+from dataclasses import dataclass
+from datetime import date as _date
+from functools import lru_cache
+from itertools import chain
+from rapidfuzz import fuzz, process
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
+log = logging.getLogger(__name__)
+
 BASE_URL = "https://api.setlist.fm/rest/1.0"
 
 # Rate limiting: Setlist.fm allows ~2 requests per second
 LAST_REQUEST_TIME = 0
 MIN_REQUEST_INTERVAL = 0.5  # 500ms between requests
+_rate_limit_lock = threading.Lock()
+
+# Shared keep-alive connection pool. The adapter retries 429/5xx responses
+# with exponential backoff and honours Retry-After.
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(
+    pool_maxsize=8,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+))
+
+# Optional on-disk cache of search results so repeat runs skip the network.
+# Setlists can still be edited for a while after a show, hence the TTL.
+CACHE_FILE = os.getenv("SETLISTFM_CACHE_FILE")
+CACHE_TTL = 7 * 24 * 3600  # one week
+EMPTY_CACHE_TTL = 3600  # empty results may fill in once a setlist is submitted
+# Stored with every entry; bump it whenever SetlistEntry changes shape so
+# records pickled by an older version are refetched instead of misread
+CACHE_VERSION = 1
+_cache_lock = threading.Lock()
+
+# Minimum fuzzy score for a setlist's venue and city to count as this show
+LOCATION_MIN_SCORE = 65
+
+# Minimum fuzzy score for a setlist artist to be taken as the headliner
+HEADLINER_MIN_SCORE = 50
+
+# Characters dropped before fuzzy comparisons. Word characters are kept
+# in full Unicode so names like "Sigur Rós" or "München" keep their letters.
+_NORM_RE = re.compile(r"[^\w\s]+")
 
 
 def rate_limit():
-    """Enforce rate limiting for Setlist.fm API."""
+    """Enforce rate limiting for Setlist.fm API (safe to call from threads)."""
     global LAST_REQUEST_TIME
-    current_time = time.time()
-    time_since_last = current_time - LAST_REQUEST_TIME
+    with _rate_limit_lock:
+        current_time = time.time()
+        time_since_last = current_time - LAST_REQUEST_TIME
+        
+        if time_since_last < MIN_REQUEST_INTERVAL:
+            sleep_time = MIN_REQUEST_INTERVAL - time_since_last
+            log.debug("Rate limiting: sleeping %.2fs", sleep_time)
+            time.sleep(sleep_time)
+        
+        LAST_REQUEST_TIME = time.time()
+
+
+@lru_cache(maxsize=4096)
+def _norm_text(s):
+    """Lowercase and strip punctuation (cached, names repeat across results)."""
+    # strip() stays: fuzz.ratio is position-sensitive, so a space left
+    # behind by trailing punctuation would lower the score
+    return _NORM_RE.sub("", s.lower()).strip() if s else ""
+
+
+def fuzzy_match_scores(query, choices, normalized=False, score_cutoff=0):
+    """
+    Score one string against many choices in a single batched call.
     
-    if time_since_last < MIN_REQUEST_INTERVAL:
-        sleep_time = MIN_REQUEST_INTERVAL - time_since_last
-        print(f"[DEBUG] Rate limiting: sleeping {sleep_time:.2f}s")
-        time.sleep(sleep_time)
+    Pass normalized=True when choices have already been through _norm_text;
+    only the query is normalized then, once, instead of every choice.
+    Choices scoring below score_cutoff are reported as 0, and rapidfuzz
+    can abandon them early instead of computing an exact score.
+    """
+    scores = [0] * len(choices)
+    if not query:
+        return scores
+    processor = None if normalized else _norm_text
+    if normalized:
+        query = _norm_text(query)
+    # extract_iter yields results in input order; process.extract would
+    # also sort them, which is wasted work when scores are read by index
+    for _, score, idx in process.extract_iter(query, choices, scorer=fuzz.ratio,
+                                              processor=processor,
+                                              score_cutoff=score_cutoff):
+        scores[idx] = score
+    return scores
+
+
+@lru_cache(maxsize=1024)
+def to_setlistfm_date(iso_date):
+    """
+    Convert a YYYY-MM-DD date to the DD-MM-YYYY form used by Setlist.fm.
     
-    LAST_REQUEST_TIME = time.time()
+    Single-digit months and days ("2024-3-5") are zero-padded, as
+    strptime("%Y-%m-%d") accepted them. Impossible dates raise ValueError.
+    """
+    parts = iso_date.split("-")
+    if (len(parts) != 3 or len(parts[0]) != 4
+            or not all(p.isdigit() for p in parts)
+            or not all(1 <= len(p) <= 2 for p in parts[1:])):
+        raise ValueError(f"Expected a YYYY-MM-DD date, got {iso_date!r}")
+    year, month, day = parts
+    # Calendar check only (month 13, Feb 30, ...); cheap given the lru_cache
+    _date(int(year), int(month), int(day))
+    return f"{day:0>2}-{month:0>2}-{year}"
 
 
-def fuzzy_match_score(str1, str2):
-    """Calculate fuzzy match score between two strings."""
-    if not str1 or not str2:
-        return 0
-    return fuzz.ratio(str1.lower(), str2.lower())
+def _api_headers(api_key):
+    """
+    Build request headers for the Setlist.fm API.
+    
+    Accept-Encoding is left to requests, which already offers gzip/deflate
+    (plus br/zstd when those decoders are installed). The API has no field
+    filter, so full setlist objects are always returned.
+    """
+    return {
+        "x-api-key": api_key,
+        "Accept": "application/json",
+        "User-Agent": "Concerts-me/1.0"
+    }
+
+
+def _as_list(value):
+    """Wrap a lone JSON object in a list (single-item arrays may be collapsed)."""
+    # Decoded JSON only ever holds plain lists, so an exact type check is
+    # enough and skips isinstance's subclass walk
+    return value if type(value) is list else ([value] if value else [])
+
+
+def extract_songs(setlist):
+    """
+    Collect song names from every set of a setlist in a single pass.
+    
+    Returns:
+        Dict of song names used as an ordered set
+    """
+    songs = chain.from_iterable(
+        _as_list(set_data.get("song", []))
+        for set_data in _as_list(setlist.get("sets", {}).get("set", []))
+    )
+    names = (song.get("name") if type(song) is dict else song for song in songs)
+    return dict.fromkeys(name for name in names if name)
+
+
+@dataclass(frozen=True, slots=True)
+class SetlistEntry:
+    """
+    The fields this module reads from a Setlist.fm setlist object.
+    
+    Cached responses hold these small records rather than the full JSON
+    tree (tour, coordinates, song metadata, ...), so the decoded payload
+    can be freed as soon as it has been parsed.
+    """
+    artist: str
+    venue: str
+    city: str
+    # Normalized once at decode time, then reused from the caches
+    venue_norm: str
+    city_norm: str
+    songs: tuple
+
+
+def _slim_setlist(setlist):
+    """Build a SetlistEntry from a raw Setlist.fm setlist object."""
+    venue = setlist.get("venue") or {}
+    venue_name = venue.get("name", "")
+    city_name = (venue.get("city") or {}).get("name", "")
+    return SetlistEntry(
+        artist=(setlist.get("artist") or {}).get("name", ""),
+        venue=venue_name,
+        city=city_name,
+        venue_norm=_norm_text(venue_name),
+        city_norm=_norm_text(city_name),
+        songs=tuple(extract_songs(setlist))
+    )
+
+
+def _disk_cache_get(key):
+    """
+    Return a fresh cached value for key, or None.
+    
+    Entries from another CACHE_VERSION, or that no longer unpickle into a
+    tuple of SetlistEntry, count as misses; the refetch overwrites them.
+    """
+    if not CACHE_FILE:
+        return None
+    try:
+        with _cache_lock, shelve.open(CACHE_FILE) as db:
+            entry = db.get(key)
+    except Exception as e:
+        log.debug("Unreadable setlist cache entry for %s: %s", key, e)
+        return None
+    if not (isinstance(entry, tuple) and len(entry) == 3 and entry[0] == CACHE_VERSION):
+        return None
+    _, stored_at, value = entry
+    if not (isinstance(value, tuple) and all(type(s) is SetlistEntry for s in value)):
+        return None
+    if time.time() - stored_at < (CACHE_TTL if value else EMPTY_CACHE_TTL):
+        return value
+    return None
+
+
+def _disk_cache_put(key, value):
+    """Store value under key with the current timestamp."""
+    if not CACHE_FILE:
+        return
+    with _cache_lock, shelve.open(CACHE_FILE) as db:
+        db[key] = (CACHE_VERSION, time.time(), value)
+
+
+@lru_cache(maxsize=512)
+def search_setlists(api_key, params):
+    """
+    Query /search/setlists, caching responses for the life of the process
+    and, when SETLISTFM_CACHE_FILE is set, on disk across runs.
+    
+    Args:
+        api_key: Setlist.fm API key
+        params: Tuple of (name, value) query parameter pairs
+    
+    Returns:
+        Tuple of SetlistEntry records
+    """
+    cache_key = repr(params)
+    cached = _disk_cache_get(cache_key)
+    if cached is not None:
+        return cached
+    
+    rate_limit()  # Rate limit before making request
+    response = _session.get(f"{BASE_URL}/search/setlists", headers=_api_headers(api_key),
+                            params=dict(params), timeout=(3.05, 10))
+    # Setlist.fm answers 404 when a search has no results
+    if response.status_code == 404:
+        _disk_cache_put(cache_key, ())
+        return ()
+    response.raise_for_status()
+    # Entries without an artist name are unusable; drop them before
+    # paying for the walk over their sets and songs
+    setlists = tuple(
+        _slim_setlist(s) for s in orjson.loads(response.content).get("setlist", [])
+        if (s.get("artist") or {}).get("name")
+    )
+    
+    # Empty results are kept too, but expire after EMPTY_CACHE_TTL
+    _disk_cache_put(cache_key, setlists)
+    return setlists
 
 
 def get_setlist_for_event(event):
@@ -58,11 +285,6 @@ def get_setlist_for_event(event):
     if not api_key:
         raise ValueError("Missing SETLISTFM_API_KEY")
     
-    headers = {
-        "x-api-key": api_key,
-        "Accept": "application/json"
-    }
-    
     artist = event["artist"]
     date = event["date"]
     venue = event["venue"]
@@ -72,98 +294,106 @@ def get_setlist_for_event(event):
     
     # Convert date from YYYY-MM-DD to DD-MM-YYYY for API
     try:
-        date_obj = datetime.strptime(date, "%Y-%m-%d")
-        api_date = date_obj.strftime("%d-%m-%Y")
+        api_date = to_setlistfm_date(date)
     except ValueError:
-        print(f"[ERROR] Invalid date format for {artist}: {date}")
+        log.error("Invalid date format for %s: %s", artist, date)
         return None
     
     # Search for setlists at this venue/city/date to find ALL artists
-    print(f"[DEBUG] Searching for all setlists on {api_date} at {venue} in {city}")
+    log.debug("Searching for all setlists on %s at %s in %s", api_date, venue, city)
     
-    search_url = f"{BASE_URL}/search/setlists"
-    
-    # Search by city and date (venue filtering happens after)
-    # Venue name search is too restrictive and often returns 404
+    # Let the server filter by venue first; this keeps the response down to
+    # the handful of setlists played there instead of the whole city's day.
+    # Fuzzy venue filtering still happens after.
+    # Only the first results page is read; pin it so the cache key is explicit
     params = {
         "cityName": city,
-        "date": api_date
+        "date": api_date,
+        "p": 1
     }
+    if venue:
+        params["venueName"] = venue
     
     try:
-        rate_limit()  # Rate limit before making request
-        response = requests.get(search_url, headers=headers, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        setlists = data.get("setlist", [])
+        setlists = search_setlists(api_key, tuple(params.items()))
         
-        if not setlists:
-            # If venue search failed, try city search as fallback
-            if venue and city:
-                print(f"[DEBUG] No results for venue '{venue}', trying city search: {city}")
-                params = {
-                    "cityName": city,
-                    "date": api_date
-                }
-                rate_limit()
-                response = requests.get(search_url, headers=headers, params=params, timeout=10)
-                response.raise_for_status()
-                data = response.json()
-                setlists = data.get("setlist", [])
+        if not setlists and venue and city:
+            # Venue name search is strict and often finds nothing when the
+            # sheet spells the venue differently, so fall back to the city.
+            # The API pages results (20 setlists per response), so even this
+            # broader query stays small enough to decode in one go.
+            log.debug("No results for venue '%s', trying city search: %s", venue, city)
+            params = {
+                "cityName": city,
+                "date": api_date,
+                "p": 1
+            }
+            setlists = search_setlists(api_key, tuple(params.items()))
         
         if not setlists:
-            print(f"[WARN] No setlists found for {city} on {date}")
+            log.warning("No setlists found for %s on %s", city, date)
             return None
         
-        # Filter setlists by venue match
+        # Filter setlists by venue match, scoring all candidates in one batch
+        venue_scores = (fuzzy_match_scores(venue, [s.venue_norm for s in setlists],
+                                           normalized=True, score_cutoff=LOCATION_MIN_SCORE)
+                        if venue else [100] * len(setlists))
+        city_scores = fuzzy_match_scores(city, [s.city_norm for s in setlists],
+                                         normalized=True, score_cutoff=LOCATION_MIN_SCORE)
+        
         matching_setlists = []
-        for setlist in setlists:
-            setlist_venue = setlist.get("venue", {}).get("name", "")
-            setlist_city = setlist.get("venue", {}).get("city", {}).get("name", "")
-            
-            venue_score = fuzzy_match_score(venue, setlist_venue) if venue else 100
-            city_score = fuzzy_match_score(city, setlist_city)
-            
+        for setlist, venue_score, city_score in zip(setlists, venue_scores, city_scores):
             # Require BOTH venue and city to match reasonably well
             # Slightly more lenient than before to catch variations
-            if venue_score >= 65 and city_score >= 65:
+            if venue_score >= LOCATION_MIN_SCORE and city_score >= LOCATION_MIN_SCORE:
                 matching_setlists.append(setlist)
-                print(f"[DEBUG] Found setlist: {setlist.get('artist', {}).get('name', 'Unknown')} at {setlist_venue} (venue: {venue_score:.0f}%, city: {city_score:.0f}%)")
+                log.debug("Found setlist: %s at %s (venue: %.0f%%, city: %.0f%%)",
+                          setlist.artist or "Unknown", setlist.venue, venue_score, city_score)
         
         if not matching_setlists:
-            print(f"[WARN] No matching setlists found for venue: {venue}")
+            log.warning("No matching setlists found for venue: %s", venue)
             return None
         
         # Parse setlists to build lineup
         return parse_multi_artist_setlists(matching_setlists, artist, is_festival, event)
         
     except requests.exceptions.RequestException as e:
-        if "429" in str(e):
-            print(f"[WARN] Rate limited by Setlist.fm API, waiting 2 seconds and retrying...")
-            time.sleep(2)
-            try:
-                response = requests.get(search_url, headers=headers, params=params, timeout=10)
-                response.raise_for_status()
-                data = response.json()
-                setlists = data.get("setlist", [])
-            except Exception as retry_error:
-                print(f"[ERROR] Retry failed for {artist}: {retry_error}")
-                return None
-        else:
-            print(f"[ERROR] API request failed for {artist}: {e}")
-            return None
+        # 429s and 5xx have already been retried by the session adapter
+        log.error("API request failed for %s: %s", artist, e)
+        return None
     except Exception as e:
-        print(f"[ERROR] Unexpected error fetching setlist for {artist}: {e}")
+        log.error("Unexpected error fetching setlist for %s: %s", artist, e)
         return None
 
 
+def _dedupe_lineup(setlists):
+    """
+    Merge setlists into one {name, songs} entry per artist, in first-seen order.
+    
+    Artists are keyed by their casefolded name, so duplicate submissions for
+    the same act merge even when capitalised differently. Songs are kept in a
+    dict used as an ordered set, so repeats are dropped in linear time.
+    """
+    lineup = {}
+    
+    for setlist in setlists:
+        artist_name = setlist.artist.strip()
+        if not artist_name or not setlist.songs:
+            continue
+        
+        entry = lineup.setdefault(artist_name.casefold(), {"name": artist_name, "songs": {}})
+        entry["songs"].update(dict.fromkeys(setlist.songs))
+        log.info("Found artist: %s with %d songs", artist_name, len(setlist.songs))
+    
+    return [{"name": a["name"], "songs": list(a["songs"])} for a in lineup.values()]
+
+
 def parse_multi_artist_setlists(setlists, headliner_name, is_festival, event):
     """
     Parse multiple setlists from the same show to identify headliner and openers.
     
     Args:
-        setlists: List of setlist objects from the same venue/date
+        setlists: List of SetlistEntry records from the same venue/date
         headliner_name: Expected headliner name
         is_festival: Boolean
         event: Event dictionary
@@ -180,24 +410,7 @@ def parse_multi_artist_setlists(setlists, headliner_name, is_festival, event):
         "lineup": []
     }
     
-    all_artists = []
-    
-    for setlist in setlists:
-        artist_name = setlist.get("artist", {}).get("name", "")
-        sets = setlist.get("sets", {}).get("set", [])
-        
-        all_songs = []
-        for set_data in sets:
-            songs = set_data.get("song", [])
-            song_names = [song.get("name", "") for song in songs if song.get("name")]
-            all_songs.extend(song_names)
-        
-        if all_songs:
-            all_artists.append({
-                "name": artist_name,
-                "songs": all_songs
-            })
-            print(f"[INFO] Found artist: {artist_name} with {len(all_songs)} songs")
+    all_artists = _dedupe_lineup(setlists)
     
     if not all_artists:
         return None
@@ -213,16 +426,16 @@ def parse_multi_artist_setlists(setlists, headliner_name, is_festival, event):
         result["openers"] = all_artists[:-1] if len(all_artists) > 1 else []
     else:
         # Find the headliner by fuzzy matching
-        headliner_idx = -1
-        best_match_score = 0
-        
-        for idx, artist_data in enumerate(all_artists):
-            score = fuzzy_match_score(headliner_name, artist_data["name"])
-            if score > best_match_score:
-                best_match_score = score
-                headliner_idx = idx
+        best = process.extractOne(
+            headliner_name,
+            [a["name"] for a in all_artists],
+            scorer=fuzz.ratio,
+            processor=_norm_text,
+            score_cutoff=HEADLINER_MIN_SCORE
+        ) if headliner_name else None
         
-        if headliner_idx >= 0:
+        if best:
+            headliner_idx = best[2]
             result["headliner"] = all_artists[headliner_idx]
             result["openers"] = [a for i, a in enumerate(all_artists) if i != headliner_idx]
         else:
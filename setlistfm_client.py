@@ -1,31 +1,49 @@
 # setlistfm_client.py
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 
+from setlistfm_api import search_setlists
+
 class SetlistFMClient:
-    def __init__(self, api_key):
+    def __init__(self, api_key, max_workers=4):
         self.api_key = api_key
+        self.max_workers = max_workers
+        # Deduplicated song dicts per artist, so repeat artists skip both the
+        # fetch and the rebuild
+        self._artist_cache = {}
+
+    def _fetch_setlists(self, artist):
+        try:
+            return search_setlists(self.api_key, (("artistName", artist),))
+        except requests.exceptions.RequestException:
+            return None
 
     def get_songs_from_artists(self, artists):
-        songs = []
+        artists = list(artists)
+        missing = [a for a in dict.fromkeys(artists) if a not in self._artist_cache]
 
-        for artist in artists:
-            r = requests.get(
-                f"https://api.setlist.fm/rest/1.0/search/setlists",
-                headers={"x-api-key": self.api_key, "Accept": "application/json"},
-                params={"artistName": artist}
-            )
+        # Searches are I/O-bound, so a few threads keep requests in flight;
+        # search_setlists() applies the shared rate limiter, so the pool
+        # never exceeds Setlist.fm's request budget
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(self._fetch_setlists, missing))
 
-            if r.status_code != 200:
+        for artist, setlists in zip(missing, results):
+            if setlists is None:
+                # Failed lookups aren't cached, so a later call retries them
                 continue
+            # An artist search returns many shows with mostly the same songs;
+            # a dict used as an ordered set keeps each title once
+            titles = dict.fromkeys(
+                title for setlist in setlists for title in setlist.songs
+            )
+            self._artist_cache[artist] = [
+                {"artist": artist, "title": title} for title in titles
+            ]
 
-            data = r.json()
-
-            for setlist in data.get("setlist", []):
-                for s in setlist.get("sets", {}).get("set", []):
-                    for song in s.get("song", []):
-                        songs.append({
-                            "artist": artist,
-                            "title": song["name"]
-                        })
+        songs = []
+        for artist in artists:
+            songs.extend(self._artist_cache.get(artist, ()))
 
         return songs
@@ -1,9 +1,17 @@
 # spotify_api.py
 import os
+import random
+import threading
 import time
 import requests
 import base64
+import orjson
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import List, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
@@ -12,108 +20,159 @@ SPOTIFY_REFRESH_TOKEN = os.getenv("SPOTIFY_REFRESH_TOKEN")  # optional; your flo
 TOKEN_URL = "https://accounts.spotify.com/api/token"
 API_BASE = "https://api.spotify.com/v1"
 
+class JitteredRetry(Retry):
+    """Retry whose exponential backoff is stretched by a random 0-50%.
+
+    Parallel workers that hit the same rate limit otherwise retry in lockstep
+    and collide again. A Retry-After header still takes precedence.
+    """
+
+    def get_backoff_time(self):
+        return super().get_backoff_time() * (1 + random.uniform(0, 0.5))
+
+
+# One keep-alive pool for accounts.spotify.com and api.spotify.com. The adapter
+# retries only network errors, 429 and 5xx, with jittered exponential backoff
+# and honors Retry-After, so callers only ever see the final response.
+# Permanent errors (400, 404, ...) are returned at once. POST is not retried:
+# a playlist create or track append that succeeded server-side before a 5xx
+# or timeout would otherwise be applied twice.
+_retry = JitteredRetry(
+    total=5,
+    backoff_factor=0.5,
+    status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=frozenset({"GET", "PUT", "DELETE"}),
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+# Token requests are POSTs too, but repeating one only issues another token,
+# so the accounts host gets its own adapter that does retry POST
+_token_retry = _retry.new(allowed_methods=frozenset({"POST"}))
 _session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=_retry))
+_session.mount("https://accounts.spotify.com", HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=_token_retry))
 
 # --- token caching ---
 _cached_token = None
 _cached_expiry = 0
+_token_lock = threading.Lock()
+_cached_auth = (None, {})  # (token, headers) for the last token seen
+
+# --- circuit breaker ---
+# When most of the last BREAKER_WINDOW calls failed even after the adapter's
+# retries, the API is degraded; stop calling it for BREAKER_COOLDOWN seconds
+BREAKER_WINDOW = 20
+BREAKER_COOLDOWN = 30
+_recent_failures = deque(maxlen=BREAKER_WINDOW)
+_breaker_open_until = 0.0
+_breaker_lock = threading.Lock()
 
 
 def _log(msg: str):
     print(f"[SPOTIFY] {msg}")
 
 
-def get_access_token(max_retries: int = 3) -> str:
-    global _cached_token, _cached_expiry
-    now = time.time()
-    if _cached_token and now < _cached_expiry - 30:
+def fetch_token(client_id: str, client_secret: str, refresh_token: Optional[str] = None) -> dict:
+    """
+    Request an access token on the shared session and return the token payload.
+    Uses the refresh_token grant when a refresh token is given, otherwise
+    client_credentials (no user scopes). Raises requests.RequestException on
+    failure. This is the one token request path; spotify_auth and
+    SpotifyClient call it too.
+    """
+    if refresh_token:
+        data = {"grant_type": "refresh_token", "refresh_token": refresh_token}
+    else:
+        data = {"grant_type": "client_credentials"}
+    auth_header = base64.b64encode(f"{client_id}:{client_secret}".encode()).decode()
+    resp = _session.post(TOKEN_URL, data=data, headers={"Authorization": f"Basic {auth_header}"}, timeout=15)
+    resp.raise_for_status()
+    return orjson.loads(resp.content)
+
+
+def get_access_token() -> str:
+    # Fast path without the lock; the re-check under it makes concurrent
+    # callers that all saw an expired token share a single refresh
+    if _cached_token and time.time() < _cached_expiry - 30:
         return _cached_token
 
-    if SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET:
-        # Use client credentials if refresh token not present
-        if SPOTIFY_REFRESH_TOKEN:
-            # if you use refresh token flow, use refresh_token grant
-            for attempt in range(1, max_retries + 1):
-                try:
-                    resp = _session.post(
-                        TOKEN_URL,
-                        data={
-                            "grant_type": "refresh_token",
-                            "refresh_token": SPOTIFY_REFRESH_TOKEN
-                        },
-                        auth=(SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET),
-                        timeout=15,
-                    )
-                except Exception as e:
-                    _log(f"token request exception: {e}")
-                    time.sleep(attempt)
-                    continue
-
-                if resp.status_code != 200:
-                    _log(f"token request non-200: {resp.status_code} {resp.text[:200]}")
-                    time.sleep(attempt)
-                    continue
-
-                data = resp.json()
-                _cached_token = data.get("access_token")
-                expires_in = data.get("expires_in", 3600)
-                _cached_expiry = now + expires_in
-                _log("Token acquired via refresh_token")
-                return _cached_token
-            raise RuntimeError("Spotify refresh token flow failed")
-        else:
-            # fallback to Client Credentials (no user scopes)
-            for attempt in range(1, max_retries + 1):
-                try:
-                    auth_header = base64.b64encode(f"{SPOTIFY_CLIENT_ID}:{SPOTIFY_CLIENT_SECRET}".encode()).decode()
-                    resp = _session.post(
-                        TOKEN_URL,
-                        data={"grant_type": "client_credentials"},
-                        headers={"Authorization": f"Basic {auth_header}"},
-                        timeout=15,
-                    )
-                except Exception as e:
-                    _log(f"token request exception: {e}")
-                    time.sleep(attempt)
-                    continue
-
-                if resp.status_code != 200:
-                    _log(f"client credentials token non-200: {resp.status_code} {resp.text[:200]}")
-                    time.sleep(attempt)
-                    continue
-
-                data = resp.json()
-                _cached_token = data.get("access_token")
-                expires_in = data.get("expires_in", 3600)
-                _cached_expiry = now + expires_in
-                _log("Token acquired via client_credentials")
-                return _cached_token
-            raise RuntimeError("Spotify client_credentials flow failed")
-    else:
+    with _token_lock:
+        if _cached_token and time.time() < _cached_expiry - 30:
+            return _cached_token
+        return _refresh_access_token()
+
+
+def _refresh_access_token() -> str:
+    global _cached_token, _cached_expiry
+    if not (SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET):
         raise RuntimeError("Missing Spotify credentials in environment")
 
+    flow = "refresh_token" if SPOTIFY_REFRESH_TOKEN else "client_credentials"
+    now = time.time()
+    try:
+        payload = fetch_token(SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET, SPOTIFY_REFRESH_TOKEN)
+    except requests.RequestException as e:
+        _log(f"{flow} token request failed: {e}")
+        raise RuntimeError(f"Spotify {flow} flow failed") from e
+
+    _cached_token = payload.get("access_token")
+    _cached_expiry = now + payload.get("expires_in", 3600)
+    _log(f"Token acquired via {flow}")
+    return _cached_token
+
+
+def _auth_header():
+    """Return (token, headers), rebuilding the header dict only when the token changes."""
+    global _cached_auth
+    token = get_access_token()
+    cached = _cached_auth
+    if cached[0] != token:
+        cached = _cached_auth = (token, {"Authorization": f"Bearer {token}"})
+    return cached
+
+
+def _record_outcome(failed: bool):
+    global _breaker_open_until
+    with _breaker_lock:
+        _recent_failures.append(failed)
+        if len(_recent_failures) == BREAKER_WINDOW and sum(_recent_failures) > BREAKER_WINDOW // 2:
+            _log(f"Too many failed Spotify calls; pausing requests for {BREAKER_COOLDOWN}s")
+            _breaker_open_until = time.time() + BREAKER_COOLDOWN
+            _recent_failures.clear()
+
+
+def _call_api(method: str, path: str, params=None, json_body=None) -> Optional[dict]:
+    global _cached_token
+    if time.time() < _breaker_open_until:
+        _log(f"Circuit open; skipping {method} {path}")
+        return None
 
-def _call_api(method: str, path: str, params=None, json_body=None, retries: int = 2) -> Optional[dict]:
     url = f"{API_BASE}{path}"
-    for attempt in range(1, retries + 1):
-        token = get_access_token()
-        headers = {"Authorization": f"Bearer {token}"}
+    # Encode the body once with orjson rather than per attempt via requests' json=
+    body = orjson.dumps(json_body) if json_body is not None else None
+    # Rate limits and server errors are retried by the session adapter; the
+    # only retry left here is a single token refresh on 401
+    for attempt in range(2):
+        token, headers = _auth_header()
+        if body is not None:
+            headers = {**headers, "Content-Type": "application/json"}
         try:
-            resp = _session.request(method, url, headers=headers, params=params, json=json_body, timeout=15)
-        except Exception as e:
+            resp = _session.request(method, url, headers=headers, params=params, data=body, timeout=15)
+        except requests.RequestException as e:
             _log(f"Network error calling Spotify API: {e}")
-            time.sleep(attempt)
-            continue
+            _record_outcome(True)
+            return None
 
-        if resp.status_code == 429:
-            wait = int(resp.headers.get("Retry-After", "2"))
-            _log(f"Rate limited; sleeping {wait}s")
-            time.sleep(wait)
-            continue
+        # Only rate limiting and server errors count against the breaker;
+        # 4xx answers mean the API itself is healthy
+        _record_outcome(resp.status_code == 429 or resp.status_code >= 500)
 
-        if resp.status_code >= 500:
-            _log(f"Server error {resp.status_code}; retrying")
-            time.sleep(attempt)
+        if resp.status_code == 401 and attempt == 0:
+            _log("Access token rejected; refreshing")
+            with _token_lock:
+                # Another thread may already have replaced it
+                if _cached_token == token:
+                    _cached_token = None
             continue
 
         if resp.status_code not in (200, 201):
@@ -121,7 +180,7 @@ def _call_api(method: str, path: str, params=None, json_body=None, retries: int
             return None
 
         try:
-            return resp.json()
+            return orjson.loads(resp.content)
         except Exception:
             _log("Spotify JSON decode failure")
             return None
@@ -132,51 +191,81 @@ def find_playlist_by_name(name):
     Returns playlist ID if a user's playlist with that exact name exists.
     Otherwise returns None.
     """
-    token = ensure_token()
+    token, headers = _auth_header()
     if not token:
         return None
 
-    headers = {"Authorization": f"Bearer {token}"}
-
-    # Spotify paging: we search up to 50 playlists (can be increased)
-    url = "https://api.spotify.com/v1/me/playlists?limit=50"
+    target = name.strip().casefold()
 
+    # Follow Spotify's paging links until a match is found or pages run out.
+    # The next page is requested before the current one is scanned, so the
+    # scan overlaps the round trip; a match abandons the pending fetch
+    pool = ThreadPoolExecutor(max_workers=1)
     try:
-        resp = requests.get(url, headers=headers, timeout=15)
-    except Exception:
-        return None
+        future = pool.submit(_get_playlist_page, f"{API_BASE}/me/playlists?limit=50", headers)
+        while future:
+            try:
+                data = future.result()
+            except Exception:
+                return None
+            if data is None:
+                return None
+
+            url = data.get("next")
+            future = pool.submit(_get_playlist_page, url, headers) if url else None
+            for pl in data.get("items", []):
+                if pl.get("name", "").strip().casefold() == target:
+                    return pl.get("id")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    return None
 
+
+def _get_playlist_page(url: str, headers: dict) -> Optional[dict]:
+    resp = _session.get(url, headers=headers, timeout=15)
     if resp.status_code != 200:
         return None
+    return orjson.loads(resp.content)
 
-    items = resp.json().get("items", [])
-    for pl in items:
-        if pl.get("name", "").strip().lower() == name.strip().lower():
-            return pl.get("id")
+# ----- helper functions expected by spotify_client/playlist_builder -----
+@lru_cache(maxsize=4096)
+def _cached_get(path: str, params: tuple = ()) -> dict:
+    # Read-only lookups repeat across setlists (covers, shared openers);
+    # failures raise so they are retried next time instead of cached
+    data = _call_api("GET", path, params=dict(params) if params else None)
+    if data is None:
+        raise LookupError(path)
+    return data
+
+
+def _get(path: str, **params) -> Optional[dict]:
+    try:
+        return _cached_get(path, tuple(sorted(params.items())))
+    except LookupError:
+        return None
 
-    return None
 
-# ----- helper functions expected by spotify_client/playlist_builder -----
 def search_track(query: str, limit: int = 10) -> List[dict]:
-    params = {"q": query, "type": "track", "limit": limit}
-    data = _call_api("GET", "/search", params=params)
+    # Spotify search is case-insensitive, so collapse trivially different queries
+    data = _get("/search", q=" ".join(query.lower().split()), type="track", limit=limit)
     if not data:
         return []
-    return data.get("tracks", {}).get("items", [])
+    return list(data.get("tracks", {}).get("items", []))
 
 
 def get_artist_top_tracks(artist_id: str, market: str = "US") -> List[dict]:
-    data = _call_api("GET", f"/artists/{artist_id}/top-tracks", params={"market": market})
+    data = _get(f"/artists/{artist_id}/top-tracks", market=market)
     if not data:
         return []
-    return data.get("tracks", [])
+    return list(data.get("tracks", []))
 
 
 def get_album_tracks(album_id: str) -> List[dict]:
-    data = _call_api("GET", f"/albums/{album_id}/tracks")
+    data = _get(f"/albums/{album_id}/tracks")
     if not data:
         return []
-    return data.get("items", [])
+    return list(data.get("items", []))
 
 
 def get_current_user_id() -> Optional[str]:
@@ -199,6 +288,7 @@ def add_tracks_to_playlist(playlist_id: str, uris: List[str]) -> bool:
     # Spotify accepts up to 100 URIs per request
     if not uris:
         return True
+    uris = list(dict.fromkeys(uris))  # drop repeats, keep order
     CHUNK = 100
     for i in range(0, len(uris), CHUNK):
         chunk = uris[i : i + CHUNK]
@@ -3,93 +3,224 @@ Spotify API client module.
 Handles authentication, track searching, and playlist management.
 """
 
+import logging
 import os
 import re
+import threading
+import time
+import orjson
 import requests
-from rapidfuzz import fuzz
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
+from rapidfuzz import fuzz, process
+
+from spotify_api import JitteredRetry, fetch_token
+
+
+log = logging.getLogger(__name__)
+
+
+# A match needs a total of 80 and the artist bonus adds at most 30, so a
+# name scoring under 50 can never win; rapidfuzz skips those early
+NAME_MIN_SCORE = 50
+
+# Parenthesised and bracketed asides ("(Live)", "[Remastered]") stripped by
+# _clean_song_title
+_PAREN_RE = re.compile(r'\([^)]*\)')
+_BRACKET_RE = re.compile(r'\[[^\]]*\]')
+
+# /me/playlists returns at most 50 per page; later pages are fetched in parallel
+PLAYLIST_PAGE_SIZE = 50
+PLAYLIST_PAGE_WORKERS = 5
+
+# A cached playlist index older than this is rescanned when a name misses,
+# to pick up playlists created elsewhere since the last scan
+PLAYLIST_INDEX_TTL = 300
+
+
+def _batch_ratio(query, choices, score_cutoff=0):
+    """
+    fuzz.ratio of query against every choice in one rapidfuzz call. Both
+    sides are compared as given, so callers lowercase them first. Choices
+    below score_cutoff score 0.
+    """
+    scores = [0] * len(choices)
+    for _, score, idx in process.extract_iter(query, choices, scorer=fuzz.ratio,
+                                              processor=None, score_cutoff=score_cutoff):
+        scores[idx] = score
+    return scores
+
+
+@lru_cache(maxsize=4096)
+def _clean_song_title(title):
+    """Drop parenthesised/bracketed asides and collapse whitespace."""
+    title = _BRACKET_RE.sub('', _PAREN_RE.sub('', title))
+    # Collapse whitespace; split() also drops leading/trailing runs
+    return ' '.join(title.split())
 
 
 class SpotifyClient:
     """Client for interacting with Spotify Web API."""
     
-    def __init__(self, dry_run=False):
-        """Initialize Spotify client."""
-        self.client_id = os.getenv("SPOTIFY_CLIENT_ID")
-        self.client_secret = os.getenv("SPOTIFY_CLIENT_SECRET")
-        self.refresh_token = os.getenv("SPOTIFY_REFRESH_TOKEN")
+    def __init__(self, dry_run=False, client_id=None, client_secret=None, refresh_token=None):
+        """
+        Initialize Spotify client.
+        
+        Credentials not passed explicitly are read from the SPOTIFY_CLIENT_ID,
+        SPOTIFY_CLIENT_SECRET and SPOTIFY_REFRESH_TOKEN environment variables.
+        """
+        self.client_id = client_id or os.getenv("SPOTIFY_CLIENT_ID")
+        self.client_secret = client_secret or os.getenv("SPOTIFY_CLIENT_SECRET")
+        self.refresh_token = refresh_token or os.getenv("SPOTIFY_REFRESH_TOKEN")
         self.dry_run = dry_run
         
         if not all([self.client_id, self.client_secret, self.refresh_token]):
             raise ValueError("Missing Spotify credentials")
         
         self.access_token = None
+        self._auth_headers = None
+        # time.monotonic() after which the token is treated as expired
+        self._token_expires_at = 0
+        # Serializes refreshes so concurrent 401s trigger a single token POST
+        self._token_lock = threading.RLock()
         self.cache = {"song_to_spotify": {}}
         
+        # name -> id for the user's playlists, fetched once on first lookup
+        self._playlist_name_index = None
+        self._playlist_index_at = 0
+        # playlist_id -> set of track URIs known to be in it this run, so
+        # add_tracks_to_playlist reads each playlist at most once
+        self._playlist_uri_cache = {}
+        
+        # Optional on-disk copy of song_to_spotify so repeat runs skip /search
+        # for songs that were already matched
+        self.cache_file = os.getenv("SPOTIFY_CACHE_FILE")
+        self._load_cache()
+        
+        # Every call goes to accounts.spotify.com or api.spotify.com, so one
+        # pooled session reuses keep-alive connections instead of paying a
+        # new TCP+TLS handshake per request. The adapter retries network
+        # errors, 429 and 5xx with jittered backoff and honors Retry-After;
+        # a 401 is left to _make_request, which refreshes the token first.
+        # POST is not retried: a create or append that succeeded server-side
+        # before a 5xx or timeout would otherwise be applied twice
+        retry = JitteredRetry(
+            total=4,
+            backoff_factor=1.0,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset({"GET", "PUT", "DELETE"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        self._session = requests.Session()
+        self._session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry))
+        
         # Refresh access token on init
         self._refresh_access_token()
     
-    def _refresh_access_token(self):
-        """Refresh the Spotify access token using refresh token."""
-        print("[DEBUG] Refreshing Spotify access token...")
+    def _load_cache(self):
+        """Load previously matched songs from SPOTIFY_CACHE_FILE, if set."""
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
         
-        token_url = "https://accounts.spotify.com/api/token"
+        try:
+            with open(self.cache_file, "rb") as f:
+                data = orjson.loads(f.read())
+            # dict.update would also accept (or choke on) a JSON list
+            if not isinstance(data, dict):
+                raise ValueError(f"expected a JSON object, got {type(data).__name__}")
+            self.cache["song_to_spotify"].update(data)
+            log.debug("Loaded %s cached song matches", len(self.cache['song_to_spotify']))
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring unreadable Spotify cache %s: %s", self.cache_file, e)
+    
+    def save_cache(self):
+        """Write matched songs to SPOTIFY_CACHE_FILE, if set."""
+        if not self.cache_file:
+            return
         
-        data = {
-            "grant_type": "refresh_token",
-            "refresh_token": self.refresh_token,
-            "client_id": self.client_id,
-            "client_secret": self.client_secret
-        }
+        # Misses are not persisted so later runs retry them
+        hits = {k: v for k, v in self.cache["song_to_spotify"].items() if v}
+        tmp_path = f"{self.cache_file}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(orjson.dumps(hits))
+            os.replace(tmp_path, self.cache_file)
+        except OSError as e:
+            log.warning("Could not save Spotify cache %s: %s", self.cache_file, e)
+    
+    def _refresh_access_token(self, stale_token=None):
+        """
+        Refresh the Spotify access token using refresh token.
+        
+        When stale_token is given (the token a request was rejected with),
+        the refresh is skipped if another thread has already replaced it.
+        """
+        with self._token_lock:
+            if stale_token is not None and self.access_token != stale_token:
+                return
+            self._fetch_access_token()
+    
+    def _ensure_token(self):
+        """Refresh the token shortly before it expires rather than waiting for a 401."""
+        if self.access_token and time.monotonic() < self._token_expires_at:
+            return
+        with self._token_lock:
+            if not self.access_token or time.monotonic() >= self._token_expires_at:
+                self._fetch_access_token()
+    
+    def _fetch_access_token(self):
+        log.debug("Refreshing Spotify access token...")
         
         try:
-            response = requests.post(token_url, data=data, timeout=10)
-            response.raise_for_status()
-            token_data = response.json()
+            token_data = fetch_token(self.client_id, self.client_secret, self.refresh_token)
             
             self.access_token = token_data["access_token"]
-            print("[INFO] Spotify access token refreshed successfully")
+            # Built once per token and shared by every request until the next refresh
+            self._auth_headers = {
+                "Authorization": f"Bearer {self.access_token}",
+                "Content-Type": "application/json"
+            }
+            # Refresh 30s early so in-flight requests never straddle expiry
+            self._token_expires_at = time.monotonic() + token_data.get("expires_in", 3600) - 30
+            log.info("Spotify access token refreshed successfully")
             
         except requests.exceptions.RequestException as e:
-            print(f"[ERROR] Failed to refresh Spotify token: {e}")
+            log.error("Failed to refresh Spotify token: %s", e)
             raise
     
     def _make_request(self, method, endpoint, **kwargs):
         """Make an authenticated request to Spotify API."""
-        if not self.access_token:
-            self._refresh_access_token()
-        
         url = f"https://api.spotify.com/v1{endpoint}"
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json"
-        }
+        # Serialize bodies with orjson; the Content-Type header below
+        # already declares JSON
+        if "json" in kwargs:
+            kwargs["data"] = orjson.dumps(kwargs.pop("json"))
         
         try:
-            response = requests.request(method, url, headers=headers, timeout=10, **kwargs)
+            # Inside the try so a failed refresh fails this call, not the run
+            self._ensure_token()
+            token = self.access_token
+            headers = self._auth_headers
+            response = self._session.request(method, url, headers=headers, timeout=10, **kwargs)
             
-            # Handle token expiration
+            # Safety net for tokens revoked before their expiry
             if response.status_code == 401:
-                print("[DEBUG] Token expired, refreshing...")
-                self._refresh_access_token()
-                headers["Authorization"] = f"Bearer {self.access_token}"
-                response = requests.request(method, url, headers=headers, timeout=10, **kwargs)
+                log.debug("Token rejected, refreshing...")
+                self._refresh_access_token(stale_token=token)
+                response = self._session.request(method, url, headers=self._auth_headers, timeout=10, **kwargs)
             
             response.raise_for_status()
-            return response.json() if response.content else {}
+            return orjson.loads(response.content) if response.content else {}
             
-        except requests.exceptions.RequestException as e:
-            print(f"[ERROR] Spotify API request failed: {e}")
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
+            log.error("Spotify API request failed: %s", e)
             return None
     
     def clean_song_title(self, title):
         """Clean song title for better matching."""
-        # Remove content in parentheses
-        title = re.sub(r'\([^)]*\)', '', title)
-        # Remove content in brackets
-        title = re.sub(r'\[[^\]]*\]', '', title)
-        # Remove extra whitespace
-        title = ' '.join(title.split())
-        return title.strip()
+        return _clean_song_title(title)
     
     def search_track(self, song_name, artist_name=""):
         """
@@ -102,28 +233,36 @@ class SpotifyClient:
         Returns:
             Spotify track URI or None
         """
-        # Check cache first
-        cache_key = f"{song_name}|{artist_name}".lower()
+        # Check cache first; the key ignores case and spacing so trivially
+        # different spellings of the same song share one lookup
+        cache_key = f"{' '.join(song_name.split())}|{' '.join((artist_name or '').split())}".casefold()
         if cache_key in self.cache["song_to_spotify"]:
-            print(f"[DEBUG] Cache hit for: {song_name}")
+            log.debug("Cache hit for: %s", song_name)
             return self.cache["song_to_spotify"][cache_key]
         
-        # Try multiple search strategies
-        search_queries = [
+        # Try multiple search strategies; titles without parentheses or
+        # brackets clean to themselves, so drop repeated (and empty) queries
+        # rather than paying for the same /search twice
+        clean_title = self.clean_song_title(song_name)
+        search_queries = [q for q in dict.fromkeys([
             f"{song_name} {artist_name}".strip(),
-            self.clean_song_title(song_name) + f" {artist_name}".strip(),
-            song_name,
-            self.clean_song_title(song_name)
-        ]
+            f"{clean_title} {artist_name}".strip(),
+            song_name.strip(),
+            clean_title
+        ]) if q]
         
         best_match = None
         best_score = 0
         
+        # Loop invariants, lowercased once per song rather than per candidate
+        song_lower = song_name.lower()
+        artist_lower = artist_name.lower() if artist_name else ""
+        
         for query in search_queries:
             if not query.strip():
                 continue
             
-            print(f"[DEBUG] Searching Spotify for: {query}")
+            log.debug("Searching Spotify for: %s", query)
             
             params = {
                 "q": query,
@@ -138,26 +277,31 @@ class SpotifyClient:
             
             tracks = data["tracks"]["items"]
             
-            for track in tracks:
-                track_name = track["name"]
-                track_artist = track["artists"][0]["name"] if track["artists"] else ""
-                track_uri = track["uri"]
-                
-                # Calculate fuzzy match score
-                name_score = fuzz.ratio(song_name.lower(), track_name.lower())
-                
-                # Bonus for artist match
-                artist_score = 0
-                if artist_name:
-                    artist_score = fuzz.ratio(artist_name.lower(), track_artist.lower())
-                
+            track_names = [track["name"] for track in tracks]
+            track_artists = [track["artists"][0]["name"] if track["artists"] else "" for track in tracks]
+            
+            # Calculate fuzzy match scores for all candidates at once
+            name_scores = _batch_ratio(song_lower, [name.lower() for name in track_names],
+                                       score_cutoff=NAME_MIN_SCORE)
+            
+            # Bonus for artist match, only scored for names that survived the
+            # cutoff; the others cannot reach the match threshold anyway
+            artist_scores = [0] * len(tracks)
+            contenders = [i for i, score in enumerate(name_scores) if score]
+            if artist_lower and contenders:
+                contender_artists = [track_artists[i].lower() for i in contenders]
+                for i, score in zip(contenders, _batch_ratio(artist_lower, contender_artists)):
+                    artist_scores[i] = score
+            
+            for track, track_name, track_artist, name_score, artist_score in zip(
+                    tracks, track_names, track_artists, name_scores, artist_scores):
                 total_score = name_score + (artist_score * 0.3)
                 
-                print(f"[DEBUG] Match candidate: {track_name} by {track_artist} (score: {total_score:.1f})")
+                log.debug("Match candidate: %s by %s (score: %.1f)", track_name, track_artist, total_score)
                 
                 if total_score > best_score:
                     best_score = total_score
-                    best_match = track_uri
+                    best_match = track["uri"]
             
             # If we found a good match, stop searching
             if best_score >= 80:
@@ -166,10 +310,10 @@ class SpotifyClient:
         # Cache the result
         if best_match and best_score >= 80:
             self.cache["song_to_spotify"][cache_key] = best_match
-            print(f"[INFO] Matched '{song_name}' with score {best_score:.1f}")
+            log.info("Matched '%s' with score %.1f", song_name, best_score)
             return best_match
         else:
-            print(f"[WARN] No good match found for '{song_name}' (best score: {best_score:.1f})")
+            log.warning("No good match found for '%s' (best score: %.1f)", song_name, best_score)
             self.cache["song_to_spotify"][cache_key] = None
             return None
     
@@ -180,108 +324,137 @@ class SpotifyClient:
             return data.get("id")
         return None
     
+    def _fetch_playlist_page(self, offset):
+        """Fetch one page of the current user's playlists."""
+        self._ensure_token()
+        response = self._session.get(
+            "https://api.spotify.com/v1/me/playlists",
+            headers=self._auth_headers,
+            params={"limit": PLAYLIST_PAGE_SIZE, "offset": offset},
+            timeout=10
+        )
+        log.debug("Playlist page at offset %s: status %s", offset, response.status_code)
+        response.raise_for_status()
+        return orjson.loads(response.content)
+    
     def get_user_playlists(self):
-        """Get all playlists for the current user."""
+        """
+        Get all playlists for the current user.
+        
+        Returns None if the list could not be fetched completely.
+        """
         user_id = self.get_user_id()
         if not user_id:
-            print("[ERROR] Could not get user ID for playlist retrieval")
-            return []
+            log.error("Could not get user ID for playlist retrieval")
+            return None
         
-        print(f"[DEBUG] Fetching playlists for user: {user_id}")
+        log.debug("Fetching playlists for user: %s", user_id)
         
         playlists = []
-        url = f"https://api.spotify.com/v1/me/playlists"
-        params = {"limit": 50}
-        page = 1
-        
-        while url:
-            print(f"[DEBUG] Fetching playlist page {page} from: {url}")
+        try:
+            data = self._fetch_playlist_page(0)
             
-            try:
-                response = requests.get(
-                    url,
-                    headers={"Authorization": f"Bearer {self.access_token}"},
-                    params=params if page == 1 else None,
-                    timeout=10
-                )
-                
-                print(f"[DEBUG] Response status: {response.status_code}")
-                
-                response.raise_for_status()
-                data = response.json()
-                
-                print(f"[DEBUG] Response keys: {list(data.keys())}")
-                print(f"[DEBUG] Total playlists (from API): {data.get('total', 'N/A')}")
-                
-                items = data.get("items", [])
-                print(f"[DEBUG] Items in response: {len(items)}")
-                
-                # Check if we have permission issues
-                if data.get("total", 0) > 0 and len(items) == 0:
-                    print("[ERROR] ============================================")
-                    print("[ERROR] SPOTIFY PERMISSION ERROR DETECTED!")
-                    print("[ERROR] The API reports playlists exist but returns 0 items.")
-                    print("[ERROR] This means your refresh token is missing required scopes.")
-                    print("[ERROR] ")
-                    print("[ERROR] Required scopes:")
-                    print("[ERROR]   - playlist-read-private")
-                    print("[ERROR]   - playlist-read-collaborative")
-                    print("[ERROR]   - playlist-modify-private")
-                    print("[ERROR]   - playlist-modify-public")
-                    print("[ERROR] ")
-                    print("[ERROR] You need to regenerate your SPOTIFY_REFRESH_TOKEN")
-                    print("[ERROR] with these scopes included.")
-                    print("[ERROR] ============================================")
-                    return []
-                
-                if items:
-                    print(f"[DEBUG] First playlist: {items[0].get('name', 'NO NAME')}")
-                
-                playlists.extend(items)
-                print(f"[DEBUG] Page {page}: Retrieved {len(items)} playlists")
-                
-                # Check for next page
-                url = data.get("next")
-                page += 1
-                
-                if not items:
-                    break
-                
-            except Exception as e:
-                print(f"[ERROR] Failed to fetch playlists: {e}")
-                import traceback
-                traceback.print_exc()
-                break
+            log.debug("Response keys: %s", list(data.keys()))
+            log.debug("Total playlists (from API): %s", data.get('total', 'N/A'))
+            
+            items = data.get("items", [])
+            log.debug("Items in response: %s", len(items))
+            
+            # Check if we have permission issues
+            if data.get("total", 0) > 0 and len(items) == 0:
+                log.error("============================================")
+                log.error("SPOTIFY PERMISSION ERROR DETECTED!")
+                log.error("The API reports playlists exist but returns 0 items.")
+                log.error("This means your refresh token is missing required scopes.")
+                log.error("")
+                log.error("Required scopes:")
+                log.error("  - playlist-read-private")
+                log.error("  - playlist-read-collaborative")
+                log.error("  - playlist-modify-private")
+                log.error("  - playlist-modify-public")
+                log.error("")
+                log.error("You need to regenerate your SPOTIFY_REFRESH_TOKEN")
+                log.error("with these scopes included.")
+                log.error("============================================")
+                return None
+            
+            if items:
+                log.debug("First playlist: %s", items[0].get('name', 'NO NAME'))
+            
+            playlists.extend(items)
+            
+            # The first page gives the total, so the remaining offsets are
+            # known up front and can be fetched concurrently instead of
+            # following "next" links one round trip at a time
+            offsets = range(PLAYLIST_PAGE_SIZE, data.get("total", 0), PLAYLIST_PAGE_SIZE)
+            if offsets:
+                log.debug("Fetching %s more playlist pages", len(offsets))
+                with ThreadPoolExecutor(max_workers=PLAYLIST_PAGE_WORKERS) as executor:
+                    for page in executor.map(self._fetch_playlist_page, offsets):
+                        playlists.extend(page.get("items", []))
+            
+        except Exception as e:
+            # A partial list would make existing playlists look missing
+            log.exception("Failed to fetch playlists: %s", e)
+            return None
         
-        print(f"[DEBUG] Total playlists retrieved: {len(playlists)}")
+        log.debug("Total playlists retrieved: %s", len(playlists))
         return playlists
     
+    def refresh_playlists_cache(self):
+        """Drop the cached playlist index so the next lookup rescans."""
+        self._playlist_name_index = None
+    
+    def _get_playlist_name_index(self):
+        """Return the name -> id map of the user's playlists, fetching it once."""
+        if self._playlist_name_index is None:
+            playlists = self.get_user_playlists()
+            # Only pin a complete listing; retry the fetch on the next lookup
+            if playlists is None:
+                return {}
+            index = {}
+            for playlist in playlists:
+                # Keep the first playlist when several share a name
+                index.setdefault(playlist["name"], playlist["id"])
+            self._playlist_name_index = index
+            self._playlist_index_at = time.monotonic()
+        return self._playlist_name_index
+    
     def find_playlist_by_name(self, name):
         """Find an existing playlist by exact name match."""
-        print(f"[DEBUG] ==========================================")
-        print(f"[DEBUG] Searching for existing playlist: '{name}'")
-        print(f"[DEBUG] Name length: {len(name)} characters")
-        playlists = self.get_user_playlists()
-        
-        print(f"[DEBUG] Checking against {len(playlists)} playlists...")
+        log.debug("==========================================")
+        log.debug("Searching for existing playlist: '%s'", name)
+        log.debug("Name length: %s characters", len(name))
+        index = self._get_playlist_name_index()
+        if (name not in index and self._playlist_name_index is not None
+                and time.monotonic() - self._playlist_index_at > PLAYLIST_INDEX_TTL):
+            log.debug("Playlist index is stale, rescanning")
+            self.refresh_playlists_cache()
+            index = self._get_playlist_name_index()
+        
+        log.debug("Checking against %s playlists...", len(index))
         
         # Show first few playlist names for debugging
-        if playlists:
-            print(f"[DEBUG] Sample of existing playlist names:")
-            for i, p in enumerate(playlists[:5]):
-                print(f"[DEBUG]   {i+1}. '{p['name']}'")
-        
-        for playlist in playlists:
-            playlist_name = playlist["name"]
-            if playlist_name == name:
-                print(f"[DEBUG] ✓ MATCH FOUND: '{playlist_name}' (ID: {playlist['id']})")
-                print(f"[DEBUG] ==========================================")
-                return playlist["id"]
-            elif name in playlist_name or playlist_name in name:
-                print(f"[DEBUG] ✗ Partial match (not exact): '{playlist_name}'")
-        
-        print(f"[DEBUG] ✗ NO MATCH FOUND for: '{name}'")
-        print(f"[DEBUG] ==========================================")
+        if index and log.isEnabledFor(logging.DEBUG):
+            log.debug("Sample of existing playlist names:")
+            for i, playlist_name in enumerate(list(index)[:5]):
+                log.debug("  %d. '%s'", i + 1, playlist_name)
+        
+        playlist_id = index.get(name)
+        if playlist_id:
+            log.debug("✓ MATCH FOUND: '%s' (ID: %s)", name, playlist_id)
+            log.debug("==========================================")
+            return playlist_id
+        
+        # Only walk the list for near-miss diagnostics when nothing matched
+        # and someone is reading debug output
+        if log.isEnabledFor(logging.DEBUG):
+            for playlist_name in index:
+                if name in playlist_name or playlist_name in name:
+                    log.debug("✗ Partial match (not exact): '%s'", playlist_name)
+        
+        log.debug("✗ NO MATCH FOUND for: '%s'", name)
+        log.debug("==========================================")
         return None
     
     def create_playlist(self, name, description="", track_uris=None):
@@ -304,7 +477,7 @@ class SpotifyClient:
         
         user_id = self.get_user_id()
         if not user_id:
-            print("[ERROR] Could not get user ID")
+            log.error("Could not get user ID")
             return None
         
         # Create playlist
@@ -318,36 +491,39 @@ class SpotifyClient:
             "public": False
         }
         
+        body = orjson.dumps(payload)
+        
         try:
-            response = requests.post(
+            self._ensure_token()
+            response = self._session.post(
                 f"https://api.spotify.com/v1/users/{user_id}/playlists",
-                headers={
-                    "Authorization": f"Bearer {self.access_token}",
-                    "Content-Type": "application/json"
-                },
-                json=payload,
+                headers=self._auth_headers,
+                data=body,
                 timeout=10
             )
             
             # Handle token expiration
             if response.status_code == 401:
-                print("[DEBUG] Token expired, refreshing...")
+                log.debug("Token expired, refreshing...")
                 self._refresh_access_token()
-                response = requests.post(
+                response = self._session.post(
                     f"https://api.spotify.com/v1/users/{user_id}/playlists",
-                    headers={
-                        "Authorization": f"Bearer {self.access_token}",
-                        "Content-Type": "application/json"
-                    },
-                    json=payload,
+                    headers=self._auth_headers,
+                    data=body,
                     timeout=10
                 )
             
             response.raise_for_status()
-            result = response.json()
+            result = orjson.loads(response.content)
             
             playlist_id = result["id"]
-            print(f"[INFO] Created playlist: {name} (ID: {playlist_id})")
+            log.info("Created playlist: %s (ID: %s)", name, playlist_id)
+            
+            # Keep the cached index current instead of refetching every page
+            if self._playlist_name_index is not None:
+                self._playlist_name_index.setdefault(name, playlist_id)
+            # A new playlist is empty; no need to read it back before adding
+            self._playlist_uri_cache[playlist_id] = set()
             
             # Add tracks if provided
             if track_uris:
@@ -355,10 +531,10 @@ class SpotifyClient:
             
             return playlist_id
             
-        except requests.exceptions.RequestException as e:
-            print(f"[ERROR] Failed to create playlist: {e}")
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
+            log.error("Failed to create playlist: %s", e)
             if hasattr(e, 'response') and e.response is not None:
-                print(f"[ERROR] Response: {e.response.text}")
+                log.error("Response: %s", e.response.text)
             return None
     
     def update_playlist(self, playlist_id, track_uris):
@@ -373,24 +549,84 @@ class SpotifyClient:
             print(f"[DRY RUN] Would update playlist {playlist_id} with {len(track_uris)} tracks")
             return
         
-        # Clear existing tracks
-        self._make_request("PUT", f"/playlists/{playlist_id}/tracks", json={"uris": []})
+        track_uris = list(dict.fromkeys(track_uris))
         
-        # Add new tracks
-        self.add_tracks_to_playlist(playlist_id, track_uris)
+        # PUT replaces the playlist's contents with up to 100 tracks in one
+        # call, so there is no separate clear and no moment it sits empty
+        result = self._make_request("PUT", f"/playlists/{playlist_id}/tracks", json={"uris": track_uris[:100]})
+        if result is None:
+            # Appending the rest onto the old contents would leave a mix
+            # of both setlists; leave the playlist as it was
+            self._playlist_uri_cache.pop(playlist_id, None)
+            log.error("Failed to replace tracks in playlist %s", playlist_id)
+            return
+        self._playlist_uri_cache[playlist_id] = set(track_uris[:100])
+        log.info("Replaced playlist tracks with %s tracks", min(len(track_uris), 100))
+        
+        # Append whatever didn't fit in the replace call
+        if len(track_uris) > 100:
+            self.add_tracks_to_playlist(playlist_id, track_uris[100:])
+    
+    def _get_playlist_uris(self, playlist_id):
+        """
+        Return the set of track URIs currently in a playlist.
+        
+        Returns None if any page could not be fetched.
+        """
+        uris = set()
+        offset = 0
+        while True:
+            data = self._make_request(
+                "GET",
+                f"/playlists/{playlist_id}/tracks",
+                params={"fields": "items(track(uri)),next", "limit": 100, "offset": offset}
+            )
+            if data is None:
+                return None
+            
+            for item in data.get("items", []):
+                # Removed or local tracks come back with a null track
+                track = item.get("track")
+                if track and track.get("uri"):
+                    uris.add(track["uri"])
+            
+            if not data.get("next"):
+                return uris
+            offset += 100
     
     def add_tracks_to_playlist(self, playlist_id, track_uris):
-        """Add tracks to a playlist (max 100 at a time)."""
+        """Add tracks to a playlist (max 100 at a time), skipping ones already in it."""
         if self.dry_run:
             print(f"[DRY RUN] Would add {len(track_uris)} tracks to playlist {playlist_id}")
             return
         
-        # Spotify allows max 100 tracks per request
-        for i in range(0, len(track_uris), 100):
-            batch = track_uris[i:i+100]
-            self._make_request("POST", f"/playlists/{playlist_id}/tracks", json={"uris": batch})
+        # A song played twice (or matched to the same recording) would take
+        # two playlist slots; keep the first occurrence, in order
+        track_uris = list(dict.fromkeys(track_uris))
+        
+        existing = self._playlist_uri_cache.get(playlist_id)
+        if existing is None:
+            existing = self._get_playlist_uris(playlist_id)
+            if existing is not None:
+                self._playlist_uri_cache[playlist_id] = existing
+        if existing:
+            skipped = len(track_uris)
+            track_uris = [uri for uri in track_uris if uri not in existing]
+            skipped -= len(track_uris)
+            if skipped:
+                log.info("Skipping %s tracks already in playlist", skipped)
         
-        print(f"[INFO] Added {len(track_uris)} tracks to playlist")
+        # Spotify allows max 100 tracks per request
+        chunks = [track_uris[i:i+100] for i in range(0, len(track_uris), 100)]
+        for batch in chunks:
+            if self._make_request("POST", f"/playlists/{playlist_id}/tracks", json={"uris": batch}) is None:
+                # Unknown what landed; read the playlist again next time
+                self._playlist_uri_cache.pop(playlist_id, None)
+                existing = None
+            elif existing is not None:
+                existing.update(batch)
+        
+        log.info("Added %s tracks to playlist in %s request(s)", len(track_uris), len(chunks))
     
     def create_or_update_playlist(self, name, description, track_uris):
         """
@@ -405,16 +641,16 @@ class SpotifyClient:
             Playlist ID or None
         """
         if not track_uris:
-            print("[WARN] No tracks to add to playlist")
+            log.warning("No tracks to add to playlist")
             return None
         
         # Check if playlist exists
         existing_id = self.find_playlist_by_name(name)
         
         if existing_id:
-            print(f"[INFO] Playlist '{name}' already exists, updating...")
+            log.info("Playlist '%s' already exists, updating...", name)
             self.update_playlist(existing_id, track_uris)
             return existing_id
         else:
-            print(f"[INFO] Creating new playlist: {name}")
+            log.info("Creating new playlist: %s", name)
             return self.create_playlist(name, description, track_uris)
@@ -1,4 +1,10 @@
-from fuzzywuzzy import fuzz
+from rapidfuzz import fuzz, process
 
 def fuzzy_compare(a, b):
-    return fuzz.ratio(a.lower(), b.lower())
+    return fuzz.ratio(a, b, processor=str.lower)
+
+def fuzzy_best_match(query, choices, score_cutoff=0):
+    # One C-level pass over all choices instead of a fuzzy_compare per choice;
+    # returns (choice, score, index) or None
+    return process.extractOne(query, choices, scorer=fuzz.ratio, processor=str.lower,
+                              score_cutoff=score_cutoff)